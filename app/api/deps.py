@@ -1,9 +1,12 @@
+import httpx
 from fastapi import Request, HTTPException, status
 from app.core.security import verify_jwt
 
 
 def get_current_user(request: Request):
-    token = request.cookies.get("access_token")
+    # Check the raw header first so requests without the cookie skip parsing
+    raw = request.headers.get("cookie")
+    token = request.cookies.get("access_token") if raw and "access_token=" in raw else None
 
     if not token:
         raise HTTPException(
@@ -17,3 +20,7 @@ def get_current_user(request: Request):
         "user_id": payload["sub"],
         "email": payload.get("email"),
     }
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends
+import orjson
+from fastapi import APIRouter, Depends, Response
 from app.core.security import RoleChecker
 
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+_ADMIN_OK_BYTES = orjson.dumps({"msg": "Welcome admin"})
+
 
 @router.get("/admin-data")
 def admin_data(user=Depends(RoleChecker(["admin"]))):
-    return {"msg": "Welcome admin"}
+    return Response(_ADMIN_OK_BYTES, media_type="application/json")
 
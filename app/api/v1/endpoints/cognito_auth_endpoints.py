@@ -1,11 +1,55 @@
-from fastapi import APIRouter, Response, HTTPException, Request
+import httpx
+import orjson
+from urllib.parse import urlencode
+from fastapi import APIRouter, Response, HTTPException, Request, Depends, BackgroundTasks
+from app.api.deps import get_http_client
+from app.core.security_cache import get_cached_refresh, cache_refresh, evict_refresh
 from app.services import cognito_service as cs
-from app.schemas.auth_schemas import *
+from app.schemas.auth_schemas import (
+    SignUpSchema,
+    ConfirmSchema,
+    LoginSchema,
+    ForgotPasswordSchema,
+    ResetPasswordSchema,
+)
 from app.core.config import settings
-import requests
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+# Hosted-UI URL only depends on static settings, so build and serialize it once
+GOOGLE_LOGIN_URL = f"{settings.COGNITO_DOMAIN}/login?" + urlencode({
+    "client_id": settings.COGNITO_CLIENT_ID,
+    "response_type": "code",
+    "scope": "email openid profile",
+    "redirect_uri": settings.CALLBACK_URL,
+    "identity_provider": "Google",
+})
+_GOOGLE_LOGIN_PAYLOAD = orjson.dumps({"login_url": GOOGLE_LOGIN_URL})
+
+LOGOUT_URL = (
+    f"{settings.COGNITO_DOMAIN}/logout?"
+    f"client_id={settings.COGNITO_CLIENT_ID}"
+    f"&logout_uri={settings.LOGOUT_URL}"
+)
+_LOGOUT_PAYLOAD = orjson.dumps({"logout_url": LOGOUT_URL})
+
+
+# Same attributes Response.set_cookie would render, formatted once.
+# Token values are base64url JWT segments, so they never need quoting.
+_COOKIE_ATTRS = "; HttpOnly; Path=/; SameSite=lax" + ("; Secure" if settings.COOKIE_SECURE else "")
+
+_AUTH_COOKIES = ("access_token", "id_token", "refresh_token")
+_DELETE_AUTH_COOKIES = tuple(
+    (b"set-cookie", f"{name}=; Max-Age=0{_COOKIE_ATTRS}".encode("latin-1")) for name in _AUTH_COOKIES
+)
+
+
+def _set_auth_cookies(response: Response, tokens: dict):
+    for name in _AUTH_COOKIES:
+        value = tokens.get(name)
+        if value:
+            response.raw_headers.append((b"set-cookie", f"{name}={value}{_COOKIE_ATTRS}".encode("latin-1")))
+
 # ------------------ SIGNUP / LOGIN ------------------
 
 @router.post("/signup")
@@ -14,38 +58,14 @@ def signup(data: SignUpSchema):
 
 
 @router.post("/confirm-signup")
-def confirm_signup(data: ConfirmSchema):
-    return cs.confirm_signup(data.email, data.otp)
+async def confirm_signup(data: ConfirmSchema):
+    return await cs.confirm_signup(data.email, data.otp)
 
 
 @router.post("/login")
 def login(data: LoginSchema, response: Response):
     tokens = cs.login(data.email, data.password)
-
-    response.set_cookie(
-        "access_token",
-        tokens["access_token"],
-        httponly=True,
-        samesite="lax",
-        secure=False  # True in production with HTTPS
-    )
-
-    response.set_cookie(
-    "id_token",
-    tokens["id_token"],
-    httponly=True,
-    samesite="lax",
-    secure=False
-    )
-
-
-    response.set_cookie(
-        "refresh_token",
-        tokens["refresh_token"],
-        httponly=True,
-        samesite="lax",
-        secure=False
-    )
+    _set_auth_cookies(response, tokens)
 
     return {"message": "Login successful"}
 
@@ -53,47 +73,14 @@ def login(data: LoginSchema, response: Response):
 # ------------------ GOOGLE LOGIN ------------------
 
 @router.get("/google-login")
-def google_login():
-    return {
-        "login_url": (
-            f"{settings.COGNITO_DOMAIN}/login?"
-            f"client_id={settings.COGNITO_CLIENT_ID}"
-            f"&response_type=code"
-            f"&scope=email+openid+profile"
-            f"&redirect_uri={settings.CALLBACK_URL}"
-            f"&identity_provider=Google"
-        )
-    }
+async def google_login():
+    return Response(content=_GOOGLE_LOGIN_PAYLOAD, media_type="application/json")
 
 
 @router.get("/callback")
-def callback(code: str, response: Response):
-    token_url = f"{settings.COGNITO_DOMAIN}/oauth2/token"
-
-    data = {
-        "grant_type": "authorization_code",
-        "client_id": settings.COGNITO_CLIENT_ID,
-        "code": code,
-        "redirect_uri": settings.CALLBACK_URL,
-    }
-
-    r = requests.post(token_url, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"})
-
-    if r.status_code != 200:
-        raise HTTPException(400, r.text)
-
-    tokens = r.json()
-
-    response.set_cookie("access_token", tokens["access_token"], httponly=True)
-    response.set_cookie("refresh_token", tokens["refresh_token"], httponly=True)
-    response.set_cookie(
-    "id_token",
-    tokens["id_token"],
-    httponly=True,
-    samesite="lax",
-    secure=False
-    )
-
+async def callback(code: str, response: Response, client: httpx.AsyncClient = Depends(get_http_client)):
+    tokens = await cs.exchange_code_for_tokens(client, code)
+    _set_auth_cookies(response, tokens)
 
     return {"message": "Google login successful"}
 
@@ -101,18 +88,18 @@ def callback(code: str, response: Response):
 # ------------------ LOGOUT ------------------
 
 @router.post("/logout")
-def logout(response: Response):
-    response.delete_cookie("access_token")
-    response.delete_cookie("id_token")
-    response.delete_cookie("refresh_token")
+async def logout(request: Request, background: BackgroundTasks):
+    refresh_token = request.cookies.get("refresh_token")
+    if refresh_token:
+        evict_refresh(refresh_token)
+        # Revoke after the response is sent; the client only waits for cookies
+        background.add_task(cs.revoke_token, refresh_token)
 
-    return {
-        "logout_url": (
-            f"{settings.COGNITO_DOMAIN}/logout?"
-            f"client_id={settings.COGNITO_CLIENT_ID}"
-            f"&logout_uri={settings.LOGOUT_URL}"
-        )
-    }
+    # A returned Response is sent as-is (headers set on an injected one are
+    # dropped), so the delete-cookie headers go on this one directly
+    resp = Response(_LOGOUT_PAYLOAD, media_type="application/json")
+    resp.raw_headers.extend(_DELETE_AUTH_COOKIES)
+    return resp
 
 
 
@@ -131,42 +118,16 @@ def reset_password(data: ResetPasswordSchema):
 # ------------------ TOKEN REFRESH ------------------
 
 @router.post("/refresh")
-def refresh_token(request: Request, response: Response):
+async def refresh_token(request: Request, response: Response, client: httpx.AsyncClient = Depends(get_http_client)):
     refresh_token = request.cookies.get("refresh_token")
 
     if not refresh_token:
         raise HTTPException(status_code=401, detail="Refresh token missing")
 
-    token_url = f"{settings.COGNITO_DOMAIN}/oauth2/token"
-
-    data = {
-        "grant_type": "refresh_token",
-        "client_id": settings.COGNITO_CLIENT_ID,
-        "refresh_token": refresh_token,
-    }
-
-    r = requests.post(token_url, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"})
-
-    if r.status_code != 200:
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
-
-    tokens = r.json()
-
-    response.set_cookie(
-        "access_token",
-        tokens["access_token"],
-        httponly=True,
-        samesite="lax",
-        secure=False
-    )
-
-    response.set_cookie(
-    "id_token",
-    tokens["id_token"],
-    httponly=True,
-    samesite="lax",
-    secure=False
-    )
-
+    tokens = get_cached_refresh(refresh_token)
+    if tokens is None:
+        tokens = await cs.refresh_tokens(client, refresh_token)
+        cache_refresh(refresh_token, tokens)
+    _set_auth_cookies(response, tokens)
 
     return {"message": "Token refreshed"}
@@ -1,23 +1,36 @@
 """Health check endpoints for production monitoring."""
 
+import time
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.database import get_db
 from fastapi import HTTPException
 
 router = APIRouter(tags=["Health"])
 
+# Successful DB probes are reused for this long so bursts of liveness
+# checks don't each check out a pooled connection.
+DB_PROBE_TTL = 2.0
+_last_db_ok = float("-inf")
+
+
 @router.get("/health")
-def health_check():
+async def health_check():
     """Basic health check endpoint."""
     return {"status": "healthy", "service": "fastapi-auth"}
 
 
 @router.get("/health/db")
-def database_health_check(db: Session = Depends(get_db)):
+async def database_health_check(db: AsyncSession = Depends(get_db)):
+    """Database connectivity check, cached for DB_PROBE_TTL seconds on success."""
+    global _last_db_ok
+    if time.monotonic() - _last_db_ok < DB_PROBE_TTL:
+        return {"status": "healthy", "database": "connected"}
+
     try:
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
+        _last_db_ok = time.monotonic()
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         raise HTTPException(status_code=503, detail={
@@ -1,35 +1,54 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import bindparam, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.security import get_current_user
 from app.core.rbac import require_roles
+from app.core.security_cache import get_cached_user, cache_user
 from app.database import get_db
 from app.models.user import User
 from app.schemas.auth_schemas import UserResponse
 
 router = APIRouter(prefix="/user", tags=["User"])
 
+# Built once; only the bound uid changes per request
+_profile_stmt = select(User.id, User.email, User.role).where(User.id == bindparam("uid"))
+
 
 # 👤 Normal user
-@router.get("/profile", response_model=UserResponse)
-def profile(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == current_user["user_id"]).first()
+@router.get("/profile", responses={200: {"model": UserResponse}})
+async def profile(current_user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    cached = get_cached_user(current_user["user_id"])
+    if cached is not None:
+        return ORJSONResponse(cached)
+
+    # Only the response columns; skips ORM hydration on the common path
+    result = await db.execute(_profile_stmt, {"uid": current_user["user_id"]})
+    user = result.first()
 
     if not user:
-        user = User(
+        # Create-or-fetch in one statement: if a concurrent request inserted
+        # the row first, the no-op update just hands it back
+        insert_stmt = pg_insert(User).values(
             id=current_user["user_id"],
             email=current_user["email"],
             role=",".join(current_user["groups"])  # store groups as metadata
         )
-        try:
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        except IntegrityError:
-            db.rollback()
-            user = db.query(User).filter(User.id == current_user["user_id"]).first()
-
-    return user
+        result = await db.execute(
+            insert_stmt.on_conflict_do_update(
+                index_elements=[User.id],
+                set_={"id": insert_stmt.excluded.id},
+            ).returning(User)
+        )
+        user = result.scalar_one()
+        await db.commit()
+
+    # asyncpg returns its own UUID subclass, which orjson refuses to encode
+    data = {"id": str(user.id), "email": user.email, "role": user.role}
+    cache_user(current_user["user_id"], data)
+    # Returned as a Response so FastAPI skips jsonable_encoder on trusted data
+    return ORJSONResponse(data)
 
 
 # 👑 Admin-only route
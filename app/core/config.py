@@ -1,6 +1,8 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
+    model_config = SettingsConfigDict(frozen=True)
+
     AWS_REGION: str = "ap-south-1"
     COGNITO_USER_POOL_ID: str
     COGNITO_CLIENT_ID: str
@@ -11,6 +13,11 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
     DATABASE_URL: str 
+    COOKIE_SECURE: bool = False  # True in production with HTTPS
+    THREADPOOL_SIZE: int = 128  # thread limiter for sync (boto3) handlers
+    JWT_CACHE_TTL: int = 30  # seconds, 0 disables verified-token caching
+    REFRESH_CACHE_TTL: int = 30  # seconds, 0 disables refresh-result caching
+    JWKS_CACHE_FILE: str = ""  # e.g. /var/cache/auth/jwks.json in a private dir; empty disables
     
 
 settings = Settings()
@@ -3,10 +3,12 @@ from app.core.security import get_current_user
 
 
 def require_roles(allowed_roles: list[str]):
+    allowed = frozenset(allowed_roles)
+
     def role_checker(user=Depends(get_current_user)):
         user_groups = user.get("groups", [])
 
-        if not any(role in user_groups for role in allowed_roles):
+        if allowed.isdisjoint(user_groups):
             raise HTTPException(status_code=403, detail="Forbidden")
 
         return user
@@ -1,72 +1,237 @@
+import asyncio
+import logging
+import os
 import requests
+import stat
+import tempfile
+import threading
 import time
+from functools import lru_cache
 from threading import Lock
-from jose import jwt, JWTError
+import httpx
+import jwt
+import orjson
+from jwt.algorithms import RSAAlgorithm
+from jwt.utils import base64url_decode
 from fastapi import HTTPException, Request, Depends, status
 from app.core.config import settings
+from app.core.security_cache import get_cached_payload, cache_payload
+
+logger = logging.getLogger(__name__)
 
 ISSUER = f"https://cognito-idp.{settings.AWS_REGION}.amazonaws.com/{settings.COGNITO_USER_POOL_ID}"
 JWKS_URL = f"{ISSUER}/.well-known/jwks.json"
+AUDIENCE = settings.COGNITO_CLIENT_ID
 
-_jwks_cache = None
-_jwks_cache_expiry = 0
+_jwks_cache = None  # kid -> constructed public key
+_jwks_cache_expiry = 0  # soft expiry: refresh in the background after this
+_jwks_hard_expiry = 0  # past this, stale keys are no longer served
 _jwks_lock = Lock()
+_jwks_refresh_lock = Lock()
+_jwks_refresh_inflight = False
 CACHE_TTL = 3600
+HARD_TTL = 24 * 3600
+JWKS_CACHE_FILE = settings.JWKS_CACHE_FILE
+
+# Keep-alive session so sync refreshes reuse the TLS connection to Cognito
+_jwks_session = requests.Session()
 
 
 # ---------------- JWKS FETCH ----------------
+def _store_jwks(jwks: dict, fetched_at: float = None):
+    global _jwks_cache, _jwks_cache_expiry, _jwks_hard_expiry
+    fetched_at = fetched_at or time.time()
+    _jwks_cache = {k["kid"]: RSAAlgorithm.from_jwk(k) for k in jwks["keys"]}
+    _jwks_cache_expiry = fetched_at + CACHE_TTL
+    _jwks_hard_expiry = fetched_at + HARD_TTL
+    return _jwks_cache
+
+
+def _persist_jwks(jwks: dict):
+    if not JWKS_CACHE_FILE:
+        return
+
+    # Write a private temp file and rename it over the target, so concurrent
+    # refreshers never interleave and readers never see a partial file
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(JWKS_CACHE_FILE) or ".")
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps({"issuer": ISSUER, "keys": jwks["keys"]}))
+        os.replace(tmp_path, JWKS_CACHE_FILE)
+    except OSError as e:
+        logger.warning("Could not persist JWKS to %s: %s", JWKS_CACHE_FILE, e)
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+def _load_persisted_jwks():
+    """Seed the cache from disk so a restarted worker can skip the first fetch."""
+    if not JWKS_CACHE_FILE:
+        return None
+
+    try:
+        with open(JWKS_CACHE_FILE, "rb") as f:
+            st = os.fstat(f.fileno())
+            # Signing keys are trusted from this file: only accept one we wrote
+            if st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                logger.warning("Ignoring JWKS cache %s: not a private file owned by this user", JWKS_CACHE_FILE)
+                return None
+            if time.time() >= st.st_mtime + HARD_TTL:
+                return None
+            cached = orjson.loads(f.read())
+        if cached.get("issuer") != ISSUER:
+            return None
+        return _store_jwks(cached, st.st_mtime)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _fetch_jwks():
+    response = _jwks_session.get(JWKS_URL, timeout=5)
+    response.raise_for_status()
+    jwks = orjson.loads(response.content)
+    keys = _store_jwks(jwks)
+    _persist_jwks(jwks)
+    return keys
+
+
+def _refresh_jwks_in_background():
+    global _jwks_refresh_inflight
+    try:
+        _fetch_jwks()
+    except Exception as e:
+        logger.warning("JWKS refresh failed, serving cached keys: %s", e)
+    finally:
+        _jwks_refresh_inflight = False
+
+
 def get_jwks():
-    global _jwks_cache, _jwks_cache_expiry
+    """
+    Return Cognito signing keys as {kid: key}, parsed once per fetch.
+
+    Past CACHE_TTL the cached keys keep being served while one background
+    thread re-fetches them; only a cold cache or one past HARD_TTL blocks.
+    """
+    global _jwks_refresh_inflight
+    keys = _jwks_cache
+    now = time.time()
+    if keys and now < _jwks_cache_expiry:
+        return keys
+
+    if keys and now < _jwks_hard_expiry:
+        with _jwks_refresh_lock:
+            start_refresh = not _jwks_refresh_inflight
+            _jwks_refresh_inflight = True
+        if start_refresh:
+            threading.Thread(target=_refresh_jwks_in_background, daemon=True).start()
+        return keys
+
     with _jwks_lock:
-        if _jwks_cache and time.time() < _jwks_cache_expiry:
+        if _jwks_cache and time.time() < _jwks_hard_expiry:
             return _jwks_cache
+        return _load_persisted_jwks() or _fetch_jwks()
+
+
+async def refresh_jwks(http_client: httpx.AsyncClient):
+    """Fetch JWKS without blocking the event loop and replace the cached keys."""
+    response = await http_client.get(JWKS_URL)
+    response.raise_for_status()
+    # No _jwks_lock here: a threadpool get_jwks() may hold it across its own
+    # fetch, and the swap is plain rebinds that readers tolerate
+    jwks = orjson.loads(response.content)
+    _store_jwks(jwks)
+    _persist_jwks(jwks)
 
-        response = requests.get(JWKS_URL, timeout=5)
-        response.raise_for_status()
-        _jwks_cache = response.json()
-        _jwks_cache_expiry = time.time() + CACHE_TTL
-        return _jwks_cache
+
+async def refresh_jwks_periodically(http_client: httpx.AsyncClient):
+    """Background task: re-fetch JWKS ahead of expiry so requests never block on it."""
+    while True:
+        await asyncio.sleep(max(CACHE_TTL - 300, 60))
+        try:
+            await refresh_jwks(http_client)
+        except Exception as e:
+            logger.warning("JWKS refresh failed, keeping cached keys: %s", e)
 
 
 # ---------------- JWT VERIFY ----------------
-def verify_jwt(token: str):
+@lru_cache(maxsize=1024)
+def _parse_header(segment: str) -> dict:
+    """Decode a JWS header segment; tokens from one pool share a handful of these."""
+    header = orjson.loads(base64url_decode(segment.encode()))
+    if not isinstance(header, dict):
+        raise ValueError("JWT header is not an object")
+    # Same guard as PyJWT's get_unverified_header: a non-str kid (e.g. a list)
+    # would be unhashable in the key lookup and surface as a 500
+    if not isinstance(header.get("kid"), str):
+        raise ValueError("JWT header kid must be a string")
+    return header
+
+
+def verify_jwt(token: str) -> dict:
+    # Verified payloads are reused until the cache TTL or the token's exp
+    payload = get_cached_payload(token)
+    if payload is not None:
+        return payload
+
+    # Unverified pre-checks reject garbage and expired tokens before RSA work
     try:
-        jwks = get_jwks()
-        headers = jwt.get_unverified_header(token)
-        kid = headers.get("kid")
+        header_segment, claims_segment, _ = token.split(".", 2)
+        headers = _parse_header(header_segment)
+        claims = orjson.loads(base64url_decode(claims_segment.encode()))
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    if not isinstance(claims, dict) or claims.get("token_use") not in ("id", "access"):
+        raise HTTPException(401, "Invalid token type")
+
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)) or exp <= time.time():
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-        key = next((k for k in jwks["keys"] if k["kid"] == kid), None)
+    try:
+        key = get_jwks().get(headers.get("kid"))
         if not key:
             raise HTTPException(401, "Invalid token key")
 
+        # Access tokens carry client_id instead of aud, so check it by hand.
+        # iat must be present but is not compared to our clock: PyJWT rejects
+        # a future iat with zero leeway, so slight clock skew behind Cognito
+        # would fail freshly issued tokens (python-jose only type-checked it)
         payload = jwt.decode(
             token,
             key,
             algorithms=["RS256"],
-            audience=settings.COGNITO_CLIENT_ID,
             issuer=ISSUER,
+            options={"verify_aud": False, "verify_iat": False, "require": ["exp", "iat"]},
         )
 
         if payload.get("token_use") not in ["id", "access"]:
             raise HTTPException(401, "Invalid token type")
 
+        if payload.get("aud", payload.get("client_id")) != AUDIENCE:
+            raise HTTPException(401, "Invalid token audience")
+
+        cache_payload(token, payload)
         return payload
 
-    except JWTError:
+    except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
 
 # ---------------- TOKEN EXTRACT ----------------
-def get_token_from_request(request: Request):
+def get_token_from_request(request: Request) -> str:
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
-        return auth_header.split(" ")[1]
-
-    if request.cookies.get("id_token"):
-        return request.cookies.get("id_token")
+        return auth_header[7:]
 
-    if request.cookies.get("access_token"):
-        return request.cookies.get("access_token")
+    cookies = request.cookies
+    token = cookies.get("id_token") or cookies.get("access_token")
+    if token:
+        return token
 
     raise HTTPException(status_code=401, detail="Not authenticated")
 
@@ -87,12 +252,12 @@ def get_current_user(request: Request):
 # 🛡️ ---------------- RBAC ----------------
 class RoleChecker:
     def __init__(self, allowed_roles: list[str]):
-        self.allowed_roles = allowed_roles
+        self.allowed_roles = frozenset(allowed_roles)
 
     def __call__(self, current_user=Depends(get_current_user)):
         user_groups = current_user.get("groups", [])
 
-        if not any(role in user_groups for role in self.allowed_roles):
+        if self.allowed_roles.isdisjoint(user_groups):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have permission"
@@ -0,0 +1,91 @@
+import hashlib
+import time
+from threading import Lock, RLock
+from cachetools import TTLCache
+from app.core.config import settings
+
+# Verified JWT payloads keyed by a short hash of the raw token
+_cache = TTLCache(maxsize=10_000, ttl=max(settings.JWT_CACHE_TTL, 1))
+_lock = Lock()
+
+# Cognito refresh results keyed by refresh-token hash. Eviction on logout is
+# per worker and Cognito-side revocation is invisible here, so entries live
+# for REFRESH_CACHE_TTL seconds at most, never the access token's lifetime
+_refresh_cache = TTLCache(maxsize=10_000, ttl=max(settings.REFRESH_CACHE_TTL, 1))
+_refresh_lock = Lock()
+REFRESH_EXPIRY_MARGIN = 60
+
+# Profile rows keyed by Cognito sub; roles only change on sync so 60s is fine
+_user_cache = TTLCache(maxsize=5000, ttl=60)
+_user_lock = RLock()
+
+
+def _key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def get_cached_payload(token: str):
+    if settings.JWT_CACHE_TTL <= 0:
+        return None
+
+    with _lock:
+        payload = _cache.get(_key(token))
+
+    if payload is None or payload.get("exp", 0) <= time.time():
+        return None
+    return payload
+
+
+def cache_payload(token: str, payload: dict):
+    if settings.JWT_CACHE_TTL <= 0:
+        return
+
+    # Never keep a payload around past the token's own expiry
+    if payload.get("exp", 0) <= time.time():
+        return
+
+    with _lock:
+        _cache[_key(token)] = payload
+
+
+def get_cached_refresh(refresh_token: str):
+    if settings.REFRESH_CACHE_TTL <= 0:
+        return None
+
+    with _refresh_lock:
+        entry = _refresh_cache.get(_key(refresh_token))
+
+    if entry is None or entry[0] <= time.time():
+        return None
+    return entry[1]
+
+
+def cache_refresh(refresh_token: str, tokens: dict):
+    if settings.REFRESH_CACHE_TTL <= 0:
+        return
+
+    now = time.time()
+    expires_at = min(
+        now + tokens.get("expires_in", 0) - REFRESH_EXPIRY_MARGIN,
+        now + settings.REFRESH_CACHE_TTL,
+    )
+    if expires_at <= now:
+        return
+
+    with _refresh_lock:
+        _refresh_cache[_key(refresh_token)] = (expires_at, tokens)
+
+
+def evict_refresh(refresh_token: str):
+    with _refresh_lock:
+        _refresh_cache.pop(_key(refresh_token), None)
+
+
+def get_cached_user(user_id: str):
+    with _user_lock:
+        return _user_cache.get(user_id)
+
+
+def cache_user(user_id: str, user: dict):
+    with _user_lock:
+        _user_cache[user_id] = user
@@ -1,16 +1,74 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
+import asyncio
 import logging, time
+from contextlib import asynccontextmanager
+import anyio.to_thread
+import httpx
+import orjson
 from app.api.v1.router import api_router
 from app.database import Base, engine
 from app.services import cognito_service
+from app.core.config import settings
+from app.core.security import get_jwks, refresh_jwks, refresh_jwks_periodically
 
 # Logging config
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Production FastAPI Auth Service", docs_url=None, redoc_url=None)
+
+# ---------------------- Lifespan ----------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("🚀 Starting FastAPI Auth Service...")
+    # Sync handlers share AnyIO's default limiter (40 tokens); widen it
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    app.state.http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=10.0,
+    )
+
+    logger.info("📦 Creating database tables...")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    logger.info("✅ Database ready")
+
+    # Warm the signing keys so the first authenticated request skips the fetch,
+    # falling back to the persisted copy, then keep them fresh in the background
+    try:
+        await refresh_jwks(app.state.http_client)
+        logger.info("✅ Cognito JWKS loaded")
+    except Exception as e:
+        logger.error("❌ Failed to load Cognito JWKS: %s", e)
+        try:
+            await asyncio.to_thread(get_jwks)
+        except Exception:
+            logger.warning("⚠️ No JWKS available yet; first request will fetch them")
+    jwks_refresher = asyncio.create_task(refresh_jwks_periodically(app.state.http_client))
+
+    # Sync Cognito users into DB
+    try:
+        await cognito_service.sync_cognito_users_to_db()
+        logger.info("✅ Cognito users synced successfully")
+    except Exception as e:
+        logger.error("❌ Failed to sync Cognito users: %s", e)
+
+    try:
+        yield
+    finally:
+        jwks_refresher.cancel()
+        await app.state.http_client.aclose()
+
+
+app = FastAPI(
+    title="Production FastAPI Auth Service",
+    docs_url=None,
+    redoc_url=None,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 
 # ---------------------- Middleware for Logging ----------------------
@@ -18,40 +76,27 @@ app = FastAPI(title="Production FastAPI Auth Service", docs_url=None, redoc_url=
 async def log_requests(request: Request, call_next):
     start_time = time.time()
     response = await call_next(request)
-    duration = round(time.time() - start_time, 3)
-    logger.info(f"{request.method} {request.url.path} Status:{response.status_code} Time:{duration}s")
+    duration = time.time() - start_time
+    logger.info("%s %s Status:%s Time:%.3fs", request.method, request.url.path, response.status_code, duration)
     return response
 
 
 # ---------------------- Exception Handlers ----------------------
+_INTERNAL_ERROR_BYTES = orjson.dumps(
+    {"success": False, "message": "An unexpected error occurred", "error_code": "INTERNAL_ERROR"}
+)
+# Only "details" varies, so the 422 envelope is spliced around it as bytes
+_VALIDATION_PREFIX = b'{"success":false,"message":"Validation error","error_code":"VALIDATION_ERROR","details":'
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     errors = [{"field": ".".join(str(loc) for loc in err["loc"]), "message": err["msg"], "type": err["type"]} for err in exc.errors()]
-    return JSONResponse(
-        status_code=422,
-        content={"success": False, "message": "Validation error", "error_code": "VALIDATION_ERROR", "details": errors}
-    )
+    return Response(_VALIDATION_PREFIX + orjson.dumps(errors) + b"}", status_code=422, media_type="application/json")
 
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(status_code=500, content={"success": False, "message": "Internal server error"})
-
-
-# ---------------------- Startup Event ----------------------
-@app.on_event("startup")
-async def on_startup():
-    logger.info("🚀 Starting FastAPI Auth Service...")
-    logger.info("📦 Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("✅ Database ready")
-
-    # Sync Cognito users into DB
-    try:
-        cognito_service.sync_cognito_users_to_db()
-        logger.info("✅ Cognito users synced successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to sync Cognito users: {e}")
+    logger.exception("Unhandled exception on %s %s", request.method, request.url.path)
+    return Response(_INTERNAL_ERROR_BYTES, status_code=500, media_type="application/json")
 
 
 # ---------------------- Include API Router ----------------------
@@ -1,28 +1,53 @@
+import logging
+from urllib.parse import urlencode
 import boto3
+import httpx
+import orjson
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from app.database import SessionLocal
 from app.models.user import User
 from app.core.config import settings
 
-# Cognito client
-client = boto3.client("cognito-idp", region_name=settings.AWS_REGION)
+logger = logging.getLogger(__name__)
+
+# Hosted-UI token endpoint; URL, headers and client fields are fixed for the process
+_TOKEN_URL = f"{settings.COGNITO_DOMAIN}/oauth2/token"
+_TOKEN_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+_CLIENT_ID = settings.COGNITO_CLIENT_ID
+_CALLBACK_URL = settings.CALLBACK_URL
+
+# Cognito client, shared process-wide so its connection pool stays warm
+client = boto3.client(
+    "cognito-idp",
+    region_name=settings.AWS_REGION,
+    config=Config(
+        max_pool_connections=100,
+        connect_timeout=2,
+        read_timeout=5,
+        retries={"max_attempts": 3, "mode": "standard"},
+    ),
+)
 
 # ---------------------- UTILITY: SYNC USERS ----------------------
-def sync_cognito_users_to_db():
+async def sync_cognito_users_to_db():
     """
     Sync all users from Cognito User Pool into the local database.
     """
     session = SessionLocal()
     try:
-        response = client.list_users(UserPoolId=settings.COGNITO_USER_POOL_ID)
+        response = await run_in_threadpool(client.list_users, UserPoolId=settings.COGNITO_USER_POOL_ID)
 
         for u in response.get("Users", []):
             user_id = u["Username"]
             email_attr = next((attr["Value"] for attr in u["Attributes"] if attr["Name"] == "email"), "")
             role_attr = "user"  # default role
 
-            user = session.query(User).filter(User.id == user_id).first()
+            result = await session.execute(select(User).where(User.id == user_id))
+            user = result.scalar_one_or_none()
             if not user:
                 user = User(id=user_id, email=email_attr, role=role_attr)
                 session.add(user)
@@ -31,11 +56,11 @@ def sync_cognito_users_to_db():
                 user.email = email_attr
                 user.role = role_attr
 
-        session.commit()
+        await session.commit()
     except ClientError as e:
         raise HTTPException(500, f"Cognito sync failed: {e.response['Error']['Message']}")
     finally:
-        session.close()
+        await session.close()
 
 
 # ---------------------- SIGNUP ----------------------
@@ -53,33 +78,37 @@ def signup(email: str, password: str):
 
 
 # ---------------------- CONFIRM SIGNUP ----------------------
-def confirm_signup(email: str, otp: str):
+async def confirm_signup(email: str, otp: str):
     db = SessionLocal()
     try:
-        client.confirm_sign_up(
+        # boto3 blocks, so the Cognito calls run in the threadpool
+        await run_in_threadpool(
+            client.confirm_sign_up,
             ClientId=settings.COGNITO_CLIENT_ID,
             Username=email,
             ConfirmationCode=otp,
         )
 
         # Get user sub from Cognito
-        user = client.admin_get_user(
+        user = await run_in_threadpool(
+            client.admin_get_user,
             UserPoolId=settings.COGNITO_USER_POOL_ID,
             Username=email,
         )
         sub = next(attr["Value"] for attr in user["UserAttributes"] if attr["Name"] == "sub")
 
         # Create local DB user if not exists
-        if not db.query(User).filter_by(id=sub).first():
+        result = await db.execute(select(User).filter_by(id=sub))
+        if not result.scalar_one_or_none():
             db.add(User(id=sub, email=email))
-            db.commit()
+            await db.commit()
 
         return {"message": "Account verified successfully"}
     except ClientError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(400, e.response["Error"]["Message"])
     finally:
-        db.close()
+        await db.close()
 
 
 # ---------------------- LOGIN ----------------------
@@ -127,3 +156,49 @@ def reset_password(email: str, code: str, new_password: str):
         return {"message": "Password reset successful"}
     except ClientError as e:
         raise HTTPException(400, e.response["Error"]["Message"])
+
+
+# ---------------------- REVOKE TOKEN ----------------------
+def revoke_token(refresh_token: str):
+    """
+    Revoke a refresh token (and the tokens issued from it). Runs as a
+    background task after logout, so failures are logged, not raised.
+    """
+    try:
+        client.revoke_token(Token=refresh_token, ClientId=settings.COGNITO_CLIENT_ID)
+    except ClientError as e:
+        logger.warning("Cognito token revocation failed: %s", e.response["Error"]["Message"])
+
+
+# ---------------------- HOSTED-UI TOKEN ENDPOINT ----------------------
+async def _token_exchange(http_client: httpx.AsyncClient, form: dict, error_status: int, error_detail: str = None):
+    """
+    POST a grant to the Cognito token endpoint and return the parsed tokens.
+    Raises HTTPException(error_status) on failure, with Cognito's body unless
+    error_detail is given.
+    """
+    r = await http_client.post(_TOKEN_URL, content=urlencode(form), headers=_TOKEN_HEADERS)
+
+    if r.status_code != 200:
+        raise HTTPException(status_code=error_status, detail=error_detail or r.text)
+
+    return orjson.loads(r.content)
+
+
+# ---------------------- OAUTH TOKEN EXCHANGE ----------------------
+async def exchange_code_for_tokens(http_client: httpx.AsyncClient, code: str):
+    return await _token_exchange(http_client, {
+        "grant_type": "authorization_code",
+        "client_id": _CLIENT_ID,
+        "code": code,
+        "redirect_uri": _CALLBACK_URL,
+    }, 400)
+
+
+# ---------------------- TOKEN REFRESH ----------------------
+async def refresh_tokens(http_client: httpx.AsyncClient, refresh_token: str):
+    return await _token_exchange(http_client, {
+        "grant_type": "refresh_token",
+        "client_id": _CLIENT_ID,
+        "refresh_token": refresh_token,
+    }, 401, "Invalid refresh token")